@@ -6,11 +6,11 @@ Downloads all Adam Curtis documentaries from ThoughtMaybe.com and organizes them
 by year and series with full episode titles.
 
 Features:
-- Automatically detects optimal parallel download workers based on connection speed
+- Automatically scales parallel download workers to the measured connection speed
 - Organizes videos into folders: (year) series_name/episode_number - episode_title.mp4
 - Tracks download statistics (speed, total size, time saved via parallelization)
 - Handles failures gracefully with automatic retry capability
-- Uses only Python standard library (no external dependencies required)
+- Runs on the Python standard library alone; selectolax and aria2c are optional speedups
 
 Usage:
     python3 download_adam_curtis.py <html_file> [output_directory]
@@ -23,8 +23,8 @@ Example:
 
 Prerequisites:
     - Python 3.7+
-    - wget command-line tool
-    - curl (for speed test)
+    - aria2c (optional; used for multi-connection downloads when installed)
+    - selectolax (optional; used to parse the HTML when installed)
 
 Author: Generated for downloading Adam Curtis documentaries from ThoughtMaybe
 License: MIT
@@ -32,60 +32,191 @@ License: MIT
 
 import re
 import os
-import sys
+import json
+import mmap
+import shutil
 import subprocess
+import sys
 import time
 import threading
+import queue
+import http.client
+from html import unescape
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, urljoin
+
+try:
+    # Optional: Lexbor-backed HTML parser, used instead of regex when installed
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Referer': 'https://thoughtmaybe.com/',
+}
+REQUEST_TIMEOUT = 30
+MAX_TRIES = 3
+RETRY_BACKOFF = 2
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 1024 * 1024
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(?:\d+|\*)')
+
+# Downloads start with MIN_WORKERS and scale up once SPEED_SAMPLE_BYTES
+# have streamed and the achieved throughput is known
+MIN_WORKERS = 2
+MAX_WORKERS = 8
+SPEED_SAMPLE_BYTES = 10 * 1024 * 1024
+
+# Written into the output directory so retry_failed.py can skip the HTML
+MANIFEST_NAME = '.manifest.json'
+
+# Optional: when aria2c is installed each file is fetched over several
+# ranged connections at once, which helps on high-latency links. The
+# connection budget is shared out between however many workers are running.
+ARIA2C = shutil.which('aria2c')
+ARIA2C_TOTAL_CONNECTIONS = 16
+_aria2c_connections = ARIA2C_TOTAL_CONNECTIONS // MIN_WORKERS
+
+# Each worker thread keeps one keep-alive connection per host
+_connections = threading.local()
+
+# Serialises output from the parser and download threads
+_log_lock = threading.Lock()
+
+# Characters that are invalid in filenames on at least one platform
+FILENAME_TRANSLATION = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
+# Patterns for the ThoughtMaybe page markup, compiled once at import. They
+# are bytes patterns so they can run directly over the memory-mapped file.
+DOCTYPE_RE = re.compile(rb'<!DOCTYPE html>')
+NON_BLANK_RE = re.compile(rb'\S')
+TITLE_RE = re.compile(rb'<h1 class="light-title entry-title">([^<]+)</h1>')
+YEAR_RE = re.compile(rb'<span class=item-date>(\d{4})</span>')
+SOURCE_RE = re.compile(rb'<source src=([^\s>]+)\s+(?:title="([^"]+)")?\s*type=video/mp4>')
+PLAYLIST_RE = re.compile(rb'<div class=playlist-title><a[^>]*>([^<]+)</a></div>')
+
+
+def log(message):
+    """Print a message from any thread without it running into another thread's line."""
+    with _log_lock:
+        print(message)
 
 
 def sanitize_filename(name):
     """Remove or replace characters that are invalid in filenames."""
-    name = re.sub(r'[<>:"/\\|?*]', '_', name)
+    name = name.translate(FILENAME_TRANSLATION)
     name = name.strip('. ')
     return name
 
 
+def clean_title(raw):
+    """Decode title bytes and HTML entities, keeping the ASCII apostrophe used in folder names."""
+    return unescape(raw.decode('utf-8')).replace('\u2019', "'")
+
+
+def document_spans(content):
+    """Return (start, end) offsets of each non-blank document between DOCTYPE markers."""
+    bounds = [0]
+    for match in DOCTYPE_RE.finditer(content):
+        bounds.extend(match.span())
+    bounds.append(len(content))
+
+    return [
+        (bounds[i], bounds[i + 1])
+        for i in range(0, len(bounds), 2)
+        if NON_BLANK_RE.search(content, bounds[i], bounds[i + 1])
+    ]
+
+
 def parse_html_for_videos(html_file):
-    """Parse multi-document HTML file to extract all series, years, and episode info."""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    """Parse multi-document HTML file, yielding each series with its year and episode info."""
+    # Map the file instead of reading and decoding it; only the small
+    # captured groups are ever copied out and decoded
+    with open(html_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # An empty file cannot be mapped
+            yield from parse_documents(b'')
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            yield from parse_documents(content)
+
+
+def extract_document_regex(content, start, end):
+    """Extract (title, year, sources, playlist_titles) from one document with the compiled patterns."""
+    # Extract series title
+    title_match = TITLE_RE.search(content, start, end)
+    if not title_match:
+        return None
+
+    # Clean up HTML entities
+    series_title = clean_title(title_match.group(1))
+
+    # Extract year
+    year_match = YEAR_RE.search(content, start, end)
+    year = year_match.group(1).decode('ascii') if year_match else 'Unknown'
+
+    # Extract video sources
+    sources = [
+        (url.decode('utf-8'), source_title.decode('utf-8'))
+        for url, source_title in SOURCE_RE.findall(content, start, end)
+    ]
 
-    # Split on DOCTYPE to get individual documents
-    documents = re.split(r'<!DOCTYPE html>', content)
-    documents = [doc for doc in documents if doc.strip()]
+    # Extract episode titles from playlist-title divs
+    playlist_titles = [clean_title(t) for t in PLAYLIST_RE.findall(content, start, end)]
 
-    print(f"Found {len(documents)} documentaries in file\n")
+    return series_title, year, sources, playlist_titles
 
-    series_list = []
 
-    for doc_idx, doc in enumerate(documents):
-        # Extract series title
-        title_match = re.search(r'<h1 class="light-title entry-title">([^<]+)</h1>', doc)
-        if not title_match:
-            continue
+def extract_document_lexbor(content, start, end):
+    """Extract (title, year, sources, playlist_titles) from one document with selectolax."""
+    tree = LexborHTMLParser(content[start:end])
 
-        series_title = title_match.group(1)
-        # Clean up HTML entities
-        series_title = series_title.replace('&#8217;', "'").replace('&#8212;', '—')
-        series_title = series_title.replace('&amp;', '&').replace('&#8211;', '–')
+    # Lexbor decodes entities itself; only the apostrophe needs normalising
+    title_node = tree.css_first('h1.light-title.entry-title')
+    series_title = title_node.text().replace('\u2019', "'") if title_node else ''
+    if not series_title:
+        return None
 
-        # Extract year
-        year_match = re.search(r'<span class=item-date>(\d{4})</span>', doc)
-        year = year_match.group(1) if year_match else 'Unknown'
+    year_node = tree.css_first('span.item-date')
+    year = year_node.text().strip() if year_node else ''
+    if not (len(year) == 4 and year.isdigit()):
+        year = 'Unknown'
 
-        # Extract video sources
-        source_pattern = r'<source src=([^\s>]+)\s+(?:title="([^"]+)")?\s*type=video/mp4>'
-        sources = re.findall(source_pattern, doc)
+    sources = [
+        (node.attributes['src'], node.attributes.get('title') or '')
+        for node in tree.css('source[type="video/mp4"]')
+        if node.attributes.get('src')
+    ]
 
-        if not sources:
+    playlist_titles = [
+        node.text().replace('\u2019', "'")
+        for node in tree.css('div.playlist-title > a')
+    ]
+
+    return series_title, year, sources, playlist_titles
+
+
+def parse_documents(content):
+    """Yield series info from the concatenated HTML bytes in content, one document at a time."""
+    extract_document = extract_document_lexbor if LexborHTMLParser is not None else extract_document_regex
+
+    # Locate individual documents; each extractor works on one span of
+    # content at a time
+    spans = document_spans(content)
+
+    log(f"Found {len(spans)} documentaries in file\n")
+
+    for doc_idx, (start, end) in enumerate(spans):
+        extracted = extract_document(content, start, end)
+        if extracted is None:
             continue
 
-        # Extract episode titles from playlist-title divs
-        playlist_pattern = r'<div class=playlist-title><a[^>]*>([^<]+)</a></div>'
-        playlist_titles = re.findall(playlist_pattern, doc)
-        playlist_titles = [t.replace('&#8212;', '—').replace('&#8217;', "'").replace('&amp;', '&').replace('&#8211;', '–') for t in playlist_titles]
+        series_title, year, sources, playlist_titles = extracted
+
+        if not sources:
+            continue
 
         episodes = []
         for idx, (url, source_title) in enumerate(sources):
@@ -98,218 +229,657 @@ def parse_html_for_videos(html_file):
 
             episodes.append({'url': url, 'title': episode_title})
 
-        series_list.append({
+        log(f"  [{doc_idx + 1:2d}] ({year}) {series_title} - {len(episodes)} episode(s)")
+
+        yield {
             'title': series_title,
             'year': year,
             'episodes': episodes,
             'order': doc_idx
-        })
-
-        print(f"  [{doc_idx + 1:2d}] ({year}) {series_title} - {len(episodes)} episode(s)")
+        }
 
-    return series_list
 
+class StatsShard:
+    """Download counters written by a single thread."""
+    __slots__ = ('total_bytes', 'total_time', 'download_count', 'active_downloads', 'streamed_bytes')
 
-class DownloadStats:
-    """Thread-safe download statistics tracker."""
     def __init__(self):
-        self.lock = threading.Lock()
         self.total_bytes = 0
         self.total_time = 0
         self.download_count = 0
         self.active_downloads = 0
+        self.streamed_bytes = 0
+
+
+class DownloadStats:
+    """Thread-safe download statistics tracker.
+
+    Every thread updates only its own StatsShard, so writes need no lock
+    and never contend with other workers. Readers sum across the shards.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = StatsShard()
+            self._shards.append(shard)
+        return shard
+
+    def _sum(self, field):
+        return sum(getattr(shard, field) for shard in list(self._shards))
+
+    @property
+    def total_bytes(self):
+        return self._sum('total_bytes')
+
+    @property
+    def total_time(self):
+        return self._sum('total_time')
+
+    @property
+    def download_count(self):
+        return self._sum('download_count')
+
+    @property
+    def active_downloads(self):
+        return self._sum('active_downloads')
+
+    @property
+    def streamed_bytes(self):
+        """Bytes received so far, including downloads still in progress."""
+        return self._sum('streamed_bytes')
+
+    def add_progress(self, bytes_received):
+        self._shard().streamed_bytes += bytes_received
 
     def add_download(self, bytes_downloaded, time_taken):
-        with self.lock:
-            self.total_bytes += bytes_downloaded
-            self.total_time += time_taken
-            self.download_count += 1
+        shard = self._shard()
+        shard.total_bytes += bytes_downloaded
+        shard.total_time += time_taken
+        shard.download_count += 1
 
     def increment_active(self):
-        with self.lock:
-            self.active_downloads += 1
+        self._shard().active_downloads += 1
 
     def decrement_active(self):
-        with self.lock:
-            self.active_downloads -= 1
+        self._shard().active_downloads -= 1
+
+    def snapshot_light(self):
+        """Return (active_downloads, total_bytes, total_time) without building the full stats dict."""
+        shards = list(self._shards)
+        return (sum(shard.active_downloads for shard in shards),
+                sum(shard.total_bytes for shard in shards),
+                sum(shard.total_time for shard in shards))
 
     def get_stats(self):
-        with self.lock:
-            return {
-                'total_bytes': self.total_bytes,
-                'total_time': self.total_time,
-                'download_count': self.download_count,
-                'active_downloads': self.active_downloads,
-                'avg_speed_mbps': (self.total_bytes * 8 / (1024 * 1024) / self.total_time) if self.total_time > 0 else 0,
-                'total_gb': self.total_bytes / (1024 ** 3)
-            }
+        shards = list(self._shards)
+        total_bytes = sum(shard.total_bytes for shard in shards)
+        total_time = sum(shard.total_time for shard in shards)
+        return {
+            'total_bytes': total_bytes,
+            'total_time': total_time,
+            'download_count': sum(shard.download_count for shard in shards),
+            'active_downloads': sum(shard.active_downloads for shard in shards),
+            'avg_speed_mbps': (total_bytes * 8 / (1024 * 1024) / total_time) if total_time > 0 else 0,
+            'total_gb': total_bytes / (1024 ** 3)
+        }
+
+
+def workers_for_speed(speed_mbps):
+    """Pick a parallel worker count for the measured download speed."""
+    if speed_mbps < 10:
+        return 2
+    elif speed_mbps < 50:
+        return 4
+    elif speed_mbps < 100:
+        return 6
+    else:
+        return MAX_WORKERS
+
+
+class DownloadError(Exception):
+    """Raised when a video cannot be fetched."""
+
+
+def get_connection(url):
+    """Return this thread's keep-alive connection to the host serving url."""
+    parts = urlsplit(url)
+    pool = getattr(_connections, 'pool', None)
+    if pool is None:
+        pool = _connections.pool = {}
+
+    key = (parts.scheme, parts.netloc)
+    conn = pool.get(key)
+    if conn is None:
+        conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        conn = pool[key] = conn_class(parts.netloc, timeout=REQUEST_TIMEOUT)
+    return conn
+
+
+def drop_connection(url):
+    """Close and forget this thread's connection to the host serving url."""
+    parts = urlsplit(url)
+    pool = getattr(_connections, 'pool', {})
+    conn = pool.pop((parts.scheme, parts.netloc), None)
+    if conn is not None:
+        conn.close()
+
+
+def open_stream(url, headers):
+    """Send a GET over a pooled connection, following redirects like wget did.
+
+    Returns (response, final_url); the response is read over final_url's
+    connection, which is the one to drop if reading it fails.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        conn = get_connection(url)
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            drop_connection(url)
+            raise
+
+        if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+            response.read()
+            url = urljoin(url, response.getheader('Location'))
+            continue
+        return response, url
+
+    raise DownloadError("Too many redirects")
+
+
+def expected_size(response, written):
+    """Return the file size a 200/206 response should leave on disk, or None if unknown.
+
+    Raises HTTPException (retried by fetch) if a 206 response doesn't start
+    at the byte that was asked for.
+    """
+    if response.status == 206:
+        match = CONTENT_RANGE_RE.match(response.getheader('Content-Range', ''))
+        if not match:
+            return None
+        start, end = int(match.group(1)), int(match.group(2))
+        if start != written:
+            raise http.client.HTTPException(f"Server resumed at byte {start}, expected {written}")
+        return end + 1
 
+    length = response.getheader('Content-Length')
+    return int(length) if length and length.isdigit() else None
 
-def speed_test(url_sample, timeout=5):
-    """Download a small chunk to estimate download speed and determine worker count."""
-    print("\nRunning speed test to determine optimal worker count...")
 
+def fetch(url, output_file, stats):
+    """Stream url into output_file, resuming from any bytes already on disk with a Range request.
+
+    Returns the number of bytes received by this call.
+    """
+    last_error = "Unknown error"
+    received = 0
+
+    with open(output_file, 'ab') as f:
+        written = f.tell()
+
+        for attempt in range(MAX_TRIES):
+            if attempt:
+                # Back off a little longer each time so a briefly overloaded CDN can recover
+                time.sleep(RETRY_BACKOFF * attempt)
+
+            headers = dict(REQUEST_HEADERS)
+            if written:
+                headers['Range'] = f'bytes={written}-'
+
+            final_url = url
+            try:
+                response, final_url = open_stream(url, headers)
+
+                if response.status == 416 and written:
+                    # Nothing left to fetch if the partial file is already complete
+                    response.read()
+                    if response.getheader('Content-Range', '') == f'bytes */{written}':
+                        return received
+                    raise DownloadError(f"HTTP {response.status} {response.reason}")
+                if response.status >= 500:
+                    response.read()
+                    last_error = f"HTTP {response.status} {response.reason}"
+                    continue
+                if response.status not in (200, 206):
+                    response.read()
+                    raise DownloadError(f"HTTP {response.status} {response.reason}")
+
+                if response.status == 200 and written:
+                    # Server ignored the Range header, start over
+                    f.seek(0)
+                    f.truncate()
+                    written = 0
+
+                expected = expected_size(response, written)
+
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    written += len(chunk)
+                    received += len(chunk)
+                    stats.add_progress(len(chunk))
+
+                # A connection closed cleanly mid-body just ends the reads
+                # early, so check the length and resume if it came up short
+                if expected is not None and written < expected:
+                    raise http.client.IncompleteRead(b'', expected - written)
+                return received
+            except (http.client.HTTPException, OSError) as e:
+                drop_connection(final_url)
+                last_error = str(e) or type(e).__name__
+
+    raise DownloadError(last_error)
+
+
+def set_aria2c_workers(workers):
+    """Split the aria2c connection budget between the given number of workers."""
+    global _aria2c_connections
+    _aria2c_connections = max(1, ARIA2C_TOTAL_CONNECTIONS // workers)
+
+
+def fetch_with_aria2c(url, temp_file, stats):
+    """Download url into temp_file with aria2c, splitting it across several connections.
+
+    aria2c writes its segments at offsets spread across the file, so an
+    unfinished temp_file has holes and its size says nothing about what
+    was received. It is never resumed from: leftovers from an earlier run
+    are removed first, and a failed transfer deletes the file and its
+    control file. Returns the number of bytes downloaded.
+    """
+    control_file = temp_file.with_name(temp_file.name + '.aria2')
+
+    def remove_temp_files():
+        for path in (temp_file, control_file):
+            if path.exists():
+                path.unlink()
+
+    remove_temp_files()
+
+    connections = str(_aria2c_connections)
     cmd = [
-        'curl', '-s', '-o', '/dev/null', '-w', '%{speed_download}',
-        '--max-time', str(timeout),
-        '--range', '0-1048576',  # Download first 1MB
-        url_sample
+        ARIA2C,
+        '-x', connections,
+        '-s', connections,
+        '-k', '1M',
+        '--auto-file-renaming=false',
+        '--file-allocation=none',
+        '--console-log-level=error',
+        '--summary-interval=0',
+        '--download-result=hide',
+        f"--user-agent={REQUEST_HEADERS['User-Agent']}",
+        f"--referer={REQUEST_HEADERS['Referer']}",
+        f'--timeout={REQUEST_TIMEOUT}',
+        f'--max-tries={MAX_TRIES}',
+        '-d', str(temp_file.parent),
+        '-o', temp_file.name,
+        url
     ]
 
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout+2)
-        speed_bytes = float(result.stdout.strip())
-        speed_mbps = (speed_bytes * 8) / (1024 * 1024)
-
-        # Determine worker count based on speed
-        if speed_mbps < 10:
-            workers = 2
-        elif speed_mbps < 50:
-            workers = 4
-        elif speed_mbps < 100:
-            workers = 6
-        else:
-            workers = 8
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    if result.returncode != 0:
+        remove_temp_files()
+        output = result.stdout.decode('utf-8', 'replace').strip()
+        raise DownloadError(output.split('\n')[-1] if output else f"aria2c exited with {result.returncode}")
 
-        print(f"Estimated download speed: {speed_mbps:.1f} Mbps")
-        print(f"Using {workers} parallel workers\n")
-        return workers
-    except Exception as e:
-        print(f"Speed test failed: {e}. Using default 3 workers.\n")
-        return 3
+    received = temp_file.stat().st_size
+    stats.add_progress(received)
+    return received
 
 
-def download_video(url, output_dir, filename, stats):
-    """Download a video using wget with browser headers and track statistics."""
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+def drop_page_cache(path):
+    """Ask the kernel to evict a finished video from the page cache.
 
-    output_file = output_path / filename
+    Nothing rereads the videos, so keeping tens of GB cached only pushes
+    out directory and metadata pages the other workers need. Pages still
+    waiting to be written back are left alone rather than forcing a flush
+    here. No-op where posix_fadvise is unavailable (macOS, Windows).
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def download_video(url, output_file, stats):
+    """Download a video with browser headers (over aria2c when installed) and track statistics.
+
+    output_file is a Path whose parent directory already exists; callers
+    create each series directory once up front. Data is written to
+    ``<filename>.part`` and renamed into place once complete. A failed
+    download leaves the partial file behind so the next attempt resumes
+    where this one stopped. aria2c starts over in ``<filename>.aria2.part``.
+    """
+    filename = output_file.name
+    part_file = output_file.with_name(filename + '.part')
+    aria2c_file = output_file.with_name(filename + '.aria2.part')
 
     # Skip if already exists
     if output_file.exists():
         file_size = output_file.stat().st_size
-        print(f"[SKIP] {filename} (already exists, {file_size / (1024**2):.1f} MB)")
+        log(f"[SKIP] {filename} (already exists, {file_size / (1024**2):.1f} MB)")
         return {'success': True, 'bytes': 0, 'time': 0}
 
+    resume_from = part_file.stat().st_size if part_file.exists() and not ARIA2C else 0
+
     stats.increment_active()
     start_time = time.time()
 
-    cmd = [
-        'wget',
-        '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        '--referer=https://thoughtmaybe.com/',
-        '--timeout=30',
-        '--tries=3',
-        '--quiet',
-        '--show-progress',
-        '-O', str(output_file),
-        url
-    ]
-
-    current_stats = stats.get_stats()
-    print(f"[START] {filename} | Active: {current_stats['active_downloads']} | Avg: {current_stats['avg_speed_mbps']:.1f} Mbps")
+    active, total_bytes, total_time = stats.snapshot_light()
+    avg_speed_mbps = (total_bytes * 8 / (1024 * 1024) / total_time) if total_time > 0 else 0
+    resume_note = f" | Resuming at {resume_from / (1024**2):.1f} MB" if resume_from else ""
+    log(f"[START] {filename} | Active: {active} | Avg: {avg_speed_mbps:.1f} Mbps{resume_note}")
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        if ARIA2C:
+            file_size = fetch_with_aria2c(url, aria2c_file, stats)
+            os.replace(aria2c_file, output_file)
+            # A .part left by the in-process downloader is no longer needed
+            if part_file.exists():
+                part_file.unlink()
+        else:
+            file_size = fetch(url, part_file, stats)
+            os.replace(part_file, output_file)
+        error_msg = None
+    except (DownloadError, OSError) as e:
+        error_msg = str(e)
 
     elapsed = time.time() - start_time
     stats.decrement_active()
 
-    if result.returncode == 0:
-        file_size = output_file.stat().st_size if output_file.exists() else 0
+    if error_msg is None:
         speed_mbps = (file_size * 8 / (1024 * 1024) / elapsed) if elapsed > 0 else 0
 
         stats.add_download(file_size, elapsed)
+        drop_page_cache(output_file)
 
-        print(f"[DONE] {filename} | {file_size / (1024**2):.1f} MB in {elapsed:.1f}s | {speed_mbps:.1f} Mbps")
+        log(f"[DONE] {filename} | {file_size / (1024**2):.1f} MB in {elapsed:.1f}s | {speed_mbps:.1f} Mbps")
         return {'success': True, 'bytes': file_size, 'time': elapsed}
     else:
-        # Clean up failed partial download
-        if output_file.exists():
-            output_file.unlink()
+        # Keep partial data for the next attempt, but don't leave empty stubs
+        if part_file.exists() and part_file.stat().st_size == 0:
+            part_file.unlink()
 
-        error_msg = result.stderr.strip().split('\n')[-1] if result.stderr else "Unknown error"
-        print(f"[FAILED] {filename}: {error_msg}")
+        log(f"[FAILED] {filename}: {error_msg}")
         return {'success': False, 'bytes': 0, 'time': elapsed}
 
 
-def main():
-    if len(sys.argv) < 2:
-        print(__doc__)
-        print("\nUsage: python3 download_adam_curtis.py <html_file> [output_directory]")
-        print("Example: python3 download_adam_curtis.py all_docs.html ./videos")
-        sys.exit(1)
+def download_worker(task_queue, stats, tally):
+    """Download tasks from the queue until a None sentinel arrives."""
+    while True:
+        task = task_queue.get()
+        if task is None:
+            # Pass the sentinel on so every other worker stops too
+            task_queue.put(None)
+            return
 
-    html_file = sys.argv[1]
-    base_dir = sys.argv[2] if len(sys.argv) > 2 else './adam_curtis_collection'
+        try:
+            result = download_video(task['url'], task['path'], stats)
+            if result['success']:
+                tally['success'] += 1
+            else:
+                tally['failed'] += 1
+        except Exception as e:
+            log(f"[ERROR] {task['filename']}: {e}")
+            tally['failed'] += 1
+
+
+def download_all(download_tasks, stats):
+    """Download every task with a pool of worker threads fed through a bounded queue.
+
+    Downloads start right away on MIN_WORKERS threads. Once the first
+    SPEED_SAMPLE_BYTES have streamed, the achieved throughput decides how
+    many more workers to add, so no separate speed probe is needed. With
+    aria2c, bytes are only counted as each file finishes, so scaling waits
+    for the first file to complete. Returns (success_count, failed_count).
+    """
+    task_queue = queue.Queue(maxsize=MAX_WORKERS * 2)
+    tallies = []
+    threads = []
+
+    def add_worker():
+        tally = {'success': 0, 'failed': 0}
+        thread = threading.Thread(target=download_worker, args=(task_queue, stats, tally), daemon=True)
+        tallies.append(tally)
+        threads.append(thread)
+        thread.start()
+
+    feed_errors = []
+
+    def feed():
+        # download_tasks may be a lazy generator; always release the workers,
+        # and keep any error from producing tasks for the caller
+        try:
+            for task in download_tasks:
+                task_queue.put(task)
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            task_queue.put(None)
+
+    set_aria2c_workers(MIN_WORKERS)
+    for _ in range(MIN_WORKERS):
+        add_worker()
+    threading.Thread(target=feed, daemon=True).start()
 
-    if not os.path.exists(html_file):
-        print(f"Error: File '{html_file}' not found")
-        sys.exit(1)
+    start_time = time.time()
+    while stats.streamed_bytes < SPEED_SAMPLE_BYTES and any(thread.is_alive() for thread in threads):
+        time.sleep(0.2)
 
-    print(f"Adam Curtis Documentary Downloader")
-    print(f"{'='*70}")
-    print(f"Parsing {html_file}...\n")
+    streamed = stats.streamed_bytes
+    elapsed = time.time() - start_time
+    if streamed >= SPEED_SAMPLE_BYTES and elapsed > 0:
+        speed_mbps = streamed * 8 / (1024 * 1024) / elapsed
+        workers = workers_for_speed(speed_mbps)
+        log(f"\nMeasured download speed: {speed_mbps:.1f} Mbps")
+        log(f"Using {workers} parallel workers\n")
+        set_aria2c_workers(workers)
+        for _ in range(workers - len(threads)):
+            add_worker()
 
-    series_list = parse_html_for_videos(html_file)
+    for thread in threads:
+        thread.join()
 
-    if not series_list:
-        print("No videos found in HTML file!")
-        sys.exit(1)
+    # Parsing failed part-way: don't let the caller mistake this for a full run
+    if feed_errors:
+        raise feed_errors[0]
 
-    total_episodes = sum(len(s['episodes']) for s in series_list)
-    print(f"\nFound {len(series_list)} series with {total_episodes} total episodes")
+    return (sum(tally['success'] for tally in tallies),
+            sum(tally['failed'] for tally in tallies))
 
-    # Speed test with first video
-    if series_list and series_list[0]['episodes']:
-        sample_url = series_list[0]['episodes'][0]['url']
-        workers = speed_test(sample_url)
-    else:
-        workers = 3
 
-    # Prepare download tasks
-    download_tasks = []
-    for series in series_list:
+def iter_download_tasks(series_iter, base_dir, manifest=None):
+    """Yield a download task per episode, creating each series directory once as it first appears.
+
+    If a manifest list is given, an entry for every task is appended to it
+    for write_manifest.
+    """
+    created_dirs = set()
+
+    for series in series_iter:
         year = series['year']
         series_name = f"({year}) {series['title']}"
         series_dir = os.path.join(base_dir, sanitize_filename(series_name))
 
+        if series_dir not in created_dirs:
+            os.makedirs(series_dir, exist_ok=True)
+            created_dirs.add(series_dir)
+
         for idx, episode in enumerate(series['episodes'], 1):
             filename = f"{idx:02d} - {sanitize_filename(episode['title'])}.mp4"
-            download_tasks.append({
+            if manifest is not None:
+                manifest.append({'url': episode['url'], 'series': series_name, 'filename': filename})
+            yield {
                 'url': episode['url'],
                 'dir': series_dir,
                 'filename': filename,
+                'path': Path(series_dir) / filename,
                 'series': series_name
-            })
+            }
+
+
+def html_fingerprint(html_file):
+    """Identify the HTML file a manifest was built from by its path, size and mtime."""
+    st = os.stat(html_file)
+    return {'path': os.path.abspath(html_file), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def write_manifest(base_dir, html_file, manifest):
+    """Save the expected episodes, and the HTML they came from, for retry_failed.py."""
+    # Write beside the target and swap it in, so an interrupted run never
+    # leaves a truncated manifest behind
+    manifest_path = os.path.join(base_dir, MANIFEST_NAME)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'html': html_fingerprint(html_file), 'videos': manifest}, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, manifest_path)
+
+
+def load_manifest(base_dir, html_file):
+    """Return the episode entries saved by a previous run from this same HTML file.
+
+    Returns None if there is no readable manifest, or if it was built from
+    a different or since-modified HTML file.
+    """
+    try:
+        with open(os.path.join(base_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(saved, dict) or saved.get('html') != html_fingerprint(html_file):
+        return None
+    return saved.get('videos')
+
+
+def find_copies_on_disk(videos, base_dir):
+    """Map each URL in a list of manifest entries to the first of its files already on disk."""
+    on_disk = {}
+
+    for video in videos:
+        if video['url'] in on_disk:
+            continue
+        filename = video['filename']
+        path = Path(base_dir) / sanitize_filename(video['series']) / filename
+        if path.exists():
+            on_disk[video['url']] = {'path': path, 'filename': filename}
+
+    return on_disk
+
+
+def dedupe_tasks(download_tasks, aliases, on_disk=None):
+    """Yield only the first task for each URL, collecting later ones as (primary, alias) pairs.
+
+    The HTML dump can list the same episode under more than one series
+    page. Only the first task for each URL is downloaded; the others are
+    appended to aliases and linked to its file afterwards by link_aliases.
+    If on_disk (from find_copies_on_disk) already has a copy of a URL under
+    another name, that copy is the primary and nothing is downloaded.
+    """
+    seen = {}
+    on_disk = on_disk or {}
+
+    for task in download_tasks:
+        primary = seen.get(task['url'])
+        if primary is None:
+            copy = on_disk.get(task['url'])
+            if copy is not None and copy['path'] != task['path']:
+                aliases.append((copy, task))
+                continue
+            seen[task['url']] = task
+            yield task
+        elif primary['path'] != task['path']:
+            aliases.append((primary, task))
+
+
+def link_aliases(aliases):
+    """Hard-link each duplicate episode to its downloaded copy.
+
+    Returns (linked_count, failed), where failed lists the aliases that
+    could not be linked because their primary never downloaded.
+    """
+    linked = 0
+    failed = []
+
+    for primary, alias in aliases:
+        if alias['path'].exists():
+            continue
+        if not primary['path'].exists():
+            log(f"[FAIL] {alias['filename']} (duplicate of {primary['filename']}, which did not download)")
+            failed.append(alias)
+            continue
+
+        try:
+            os.link(primary['path'], alias['path'])
+        except OSError:
+            # Filesystems without hard links get a plain copy instead
+            shutil.copyfile(primary['path'], alias['path'])
 
+        print(f"[LINK] {alias['filename']} -> {primary['path']}")
+        linked += 1
+
+    return linked, failed
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        print("\nUsage: python3 download_adam_curtis.py <html_file> [output_directory]")
+        print("Example: python3 download_adam_curtis.py all_docs.html ./videos")
+        sys.exit(1)
+
+    html_file = sys.argv[1]
+    base_dir = sys.argv[2] if len(sys.argv) > 2 else './adam_curtis_collection'
+
+    if not os.path.exists(html_file):
+        print(f"Error: File '{html_file}' not found")
+        sys.exit(1)
+
+    print(f"Adam Curtis Documentary Downloader")
     print(f"{'='*70}")
-    print(f"Starting download of {len(download_tasks)} videos...")
-    print(f"{'='*70}\n")
+    print(f"Parsing {html_file} and downloading as series are found...\n")
+
+    # Parsing runs lazily inside download_all's feeder thread, so downloads
+    # start with the first series and tasks are never all held in memory
+    aliases = []
+    manifest = []
+    # Episodes an earlier run of this HTML left on disk are linked, not downloaded again
+    on_disk = find_copies_on_disk(load_manifest(base_dir, html_file) or [], base_dir)
+    download_tasks = dedupe_tasks(iter_download_tasks(parse_html_for_videos(html_file), base_dir, manifest),
+                                  aliases, on_disk)
 
     # Download with statistics
     stats = DownloadStats()
     overall_start = time.time()
-    success_count = 0
-    failed_count = 0
 
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_to_task = {
-            executor.submit(download_video, task['url'], task['dir'], task['filename'], stats): task
-            for task in download_tasks
-        }
+    success_count, failed_count = download_all(download_tasks, stats)
+    linked_count, failed_aliases = link_aliases(aliases)
+    failed_count += len(failed_aliases)
 
-        for future in as_completed(future_to_task):
-            task = future_to_task[future]
-            try:
-                result = future.result()
-                if result['success']:
-                    success_count += 1
-                else:
-                    failed_count += 1
-            except Exception as e:
-                print(f"[ERROR] {task['filename']}: {e}")
-                failed_count += 1
+    if success_count + failed_count == 0:
+        print("No videos found in HTML file!")
+        sys.exit(1)
+
+    write_manifest(base_dir, html_file, manifest)
 
     overall_elapsed = time.time() - overall_start
     final_stats = stats.get_stats()
@@ -318,6 +888,8 @@ def main():
     print(f"Download Complete!")
     print(f"{'='*70}")
     print(f"Success: {success_count} | Failed: {failed_count}")
+    if linked_count:
+        print(f"Duplicates Linked: {linked_count}")
     print(f"Total Downloaded: {final_stats['total_gb']:.2f} GB")
     print(f"Total Time: {overall_elapsed / 60:.1f} minutes")
     print(f"Average Speed: {final_stats['avg_speed_mbps']:.1f} Mbps")
@@ -5,32 +5,78 @@ Retry failed downloads by re-running the downloader on missing files.
 
 import os
 import sys
-from download_organized_v2 import parse_html_for_videos, sanitize_filename, download_video, DownloadStats
+from pathlib import Path
+from download_adam_curtis import parse_html_for_videos, sanitize_filename, download_video, DownloadStats, dedupe_tasks, link_aliases, load_manifest, MANIFEST_NAME, ARIA2C
 import time
 
-def find_missing_videos(html_file, base_dir):
-    """Find videos that should exist but don't."""
-    series_list = parse_html_for_videos(html_file)
+def expected_videos(html_file, base_dir):
+    """List every expected episode as a manifest entry (url, series, filename).
 
-    missing = []
+    The manifest written by the main downloader is used when it was built
+    from this same html_file, so the HTML only has to be parsed if the
+    downloader never finished or the HTML has changed since.
+    """
+    manifest = load_manifest(base_dir, html_file)
+    if manifest is not None:
+        print(f"Using {MANIFEST_NAME} from the previous run\n")
+        return manifest
+
+    if os.path.exists(os.path.join(base_dir, MANIFEST_NAME)):
+        print(f"{MANIFEST_NAME} is unreadable or from a different or modified HTML file; parsing {html_file}\n")
 
-    for series in series_list:
+    expected = []
+
+    for series in parse_html_for_videos(html_file):
         year = series['year']
         series_name = f"({year}) {series['title']}"
-        series_dir = os.path.join(base_dir, sanitize_filename(series_name))
 
         for idx, episode in enumerate(series['episodes'], 1):
             episode_title = episode['title']
             filename = f"{idx:02d} - {sanitize_filename(episode_title)}.mp4"
-            filepath = os.path.join(series_dir, filename)
+            expected.append({'url': episode['url'], 'series': series_name, 'filename': filename})
+
+    return expected
+
+def find_missing_videos(html_file, base_dir):
+    """Find videos that should exist but don't.
+
+    A missing video whose URL is already on disk under another name gets a
+    'primary' entry pointing at that copy, so it can be linked instead of
+    downloaded again.
+    """
+    missing = []
+    listings = {}
+    on_disk = {}
+
+    for video in expected_videos(html_file, base_dir):
+        series_dir = os.path.join(base_dir, sanitize_filename(video['series']))
+
+        # Read each series directory once instead of stat-ing every episode
+        if series_dir not in listings:
+            if os.path.isdir(series_dir):
+                with os.scandir(series_dir) as entries:
+                    listings[series_dir] = {entry.name: entry for entry in entries}
+            else:
+                listings[series_dir] = {}
+        existing = listings[series_dir]
+
+        filename = video['filename']
+        if filename in existing:
+            on_disk.setdefault(video['url'], {'path': Path(series_dir) / filename, 'filename': filename})
+        else:
+            # Only the in-process downloader resumes from a leftover .part file
+            part = None if ARIA2C else existing.get(filename + '.part')
+            missing.append({
+                'url': video['url'],
+                'dir': series_dir,
+                'filename': filename,
+                'path': Path(series_dir) / filename,
+                'series': video['series'],
+                'partial_bytes': part.stat().st_size if part else 0
+            })
 
-            if not os.path.exists(filepath):
-                missing.append({
-                    'url': episode['url'],
-                    'dir': series_dir,
-                    'filename': filename,
-                    'series': series_name
-                })
+    for task in missing:
+        task['primary'] = on_disk.get(task['url'])
 
     return missing
 
@@ -52,7 +98,12 @@ def main():
 
     print(f"Found {len(missing)} missing videos:\n")
     for task in missing:
-        print(f"  - {task['filename']}")
+        if task['primary']:
+            print(f"  - {task['filename']} (will be linked to {task['primary']['path']})")
+        elif task['partial_bytes']:
+            print(f"  - {task['filename']} (resuming from {task['partial_bytes'] / (1024**2):.1f} MB)")
+        else:
+            print(f"  - {task['filename']}")
 
     print(f"\n{'='*70}")
     print("Retrying failed downloads (one at a time for better error messages)...")
@@ -63,20 +114,38 @@ def main():
     failed_count = 0
     failed_list = []
 
-    for task in missing:
-        result = download_video(task['url'], task['dir'], task['filename'], stats)
+    for series_dir in {task['dir'] for task in missing}:
+        os.makedirs(series_dir, exist_ok=True)
+
+    # Duplicates of a video that is already on disk only need linking
+    linked_count, failed_aliases = link_aliases([(task['primary'], task) for task in missing if task['primary']])
+
+    aliases = []
+    to_download = [task for task in missing if not task['primary']]
+
+    for task in dedupe_tasks(to_download, aliases):
+        result = download_video(task['url'], task['path'], stats)
         if result['success']:
             success_count += 1
         else:
             failed_count += 1
             failed_list.append(task['filename'])
 
+    newly_linked, unlinked = link_aliases(aliases)
+    linked_count += newly_linked
+    failed_aliases += unlinked
+
+    failed_count += len(failed_aliases)
+    failed_list.extend(task['filename'] for task in failed_aliases)
+
     final_stats = stats.get_stats()
 
     print(f"\n{'='*70}")
     print(f"Retry Complete!")
     print(f"{'='*70}")
     print(f"Success: {success_count} | Failed: {failed_count}")
+    if linked_count:
+        print(f"Duplicates Linked: {linked_count}")
 
     if failed_count > 0:
         print(f"\nStill failing:")